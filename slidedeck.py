@@ -1,17 +1,125 @@
-from pptx import Presentation
-from pptx.enum.text import MSO_ANCHOR, MSO_AUTO_SIZE, PP_ALIGN
-from pptx.util import Inches, Pt
-from os.path import exists
+from contextlib import redirect_stdout
+from copy import deepcopy
+from os.path import exists, getsize
+import hashlib
+import io
+import math
+import os
 import re
-from PIL import Image
+import struct
+import sys
+import time
+import zlib
+
+#  python-pptx (with lxml) and Pillow are slow to import, so they are loaded on
+#  first use rather than at module import: python-pptx when a Deck is created,
+#  Pillow when an exhibit is checked.  Call warm() to load both up front.  The
+#  thread pool, zip, pickle, runpy and command-line modules are likewise
+#  imported only where they're used.
+Presentation = None
+RT = None
+MSO_ANCHOR = MSO_AUTO_SIZE = PP_ALIGN = None
+Inches = Pt = None
+CategoryChartData = XL_CHART_TYPE = None
+PackURI = PartFactory = None
+etree = qn = None
+Image = None
+
+#  Import python-pptx, if it hasn't been already
+def load_pptx():
+   global Presentation, RT, MSO_ANCHOR, MSO_AUTO_SIZE, PP_ALIGN, Inches, Pt
+   global CategoryChartData, XL_CHART_TYPE, PackURI, PartFactory, etree, qn
+   if (Presentation is None):
+      from lxml import etree
+      from pptx import Presentation as pres
+      from pptx.chart.data import CategoryChartData
+      from pptx.enum.chart import XL_CHART_TYPE
+      from pptx.opc.package import PartFactory
+      from pptx.opc.packuri import PackURI
+      from pptx.oxml.ns import qn
+      from pptx.opc.constants import RELATIONSHIP_TYPE
+      from pptx.enum.text import MSO_ANCHOR, MSO_AUTO_SIZE, PP_ALIGN
+      from pptx.util import Inches, Pt
+      RT = RELATIONSHIP_TYPE
+      Presentation = pres
+   return True
+
+#  Import Pillow, if it hasn't been already
+def load_pil():
+   global Image
+   if (Image is None):
+      from PIL import Image
+   return True
+
+#  Pre-warm the heavy dependencies, e.g. before a timed build
+def warm():
+   load_pptx()
+   load_pil()
+   return True
+
+#  Read variables from the in-memory Stata dataset in bulk through the sfi Data
+#  API and return them as a dictionary of columns for Slide.add_table() or
+#  Slide.add_chart().  Columns are keyed by variable name, or by variable label
+#  (where there is one, and no earlier column has it) if labels=True; missing
+#  values become None.  selectvar restricts the observations as in sfi's
+#  Data.get().
+def stata_columns(varlist, selectvar=None, labels=False):
+   from sfi import Data
+
+   if (isinstance(varlist, str)):
+      varlist = varlist.split()
+
+   #  One call for all variables and observations, then transpose the rows
+   rows = Data.get(var=varlist, selectvar=selectvar, missingval=None)
+   if ((len(varlist) == 1) and (len(rows) > 0) and (not isinstance(rows[0], list))):
+      rows = [[r] for r in rows]
+   if (len(rows) > 0):
+      cols = list(zip(*rows))
+   else:
+      cols = [() for v in varlist]
+
+   columns = {}
+   for j in range(0, len(varlist)):
+      key = varlist[j]
+      if (labels):
+         lab = Data.getVarLabel(varlist[j])
+         if ((lab != "") and (lab not in columns)):
+            key = lab
+      columns[key] = list(cols[j])
+   return columns
 
 class Deck:
    BAD_VALUE = -999
 
-   def __init__(self, fnpres):
+   #  Fixed zip entry timestamp and slide ID range used by deterministic saves
+   ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+   MIN_SLIDE_ID = 256
+   MAX_SLIDE_ID = 2147483647
+
+   #  Default for a new deck's dry_run: when set, save() only records the
+   #  target filename and add_slide() keeps slides without a conforming layout,
+   #  so validate() can report them
+   DRY_RUN = False
+
+   #  Preflight limits: largest exhibit file accepted and the average character
+   #  width (in ems) and line spacing used to estimate text overflow
+   MAX_EXHIBIT_BYTES = 10 * 1024 * 1024
+   AVG_CHAR_WIDTH = 0.5
+   LINE_SPACING = 1.2
+
+   def __init__(self, fnpres, dry_run=None):
       self.fnpres = fnpres
+      self.fnsave = None
+      self.dry_run = self.DRY_RUN if (dry_run is None) else dry_run
       self.slides = []
       self.slide_los = []
+      self.imports = []
+      self.ntemplate = 0
+      self.keep_template_slides = True
+      self.journal = None
+      self.journal_file = None
+      self.restored = {}
+      self.rendered = {}
 
       if (not isinstance(self.fnpres, str)):
          raise TypeError("--- presentation must be a PowerPoint filename string ---")
@@ -20,6 +128,7 @@ class Deck:
             raise FileNotFoundError("--- presentation file does not exist ---")
 
       #  Instantiate the presentation
+      load_pptx()
       self.pres = Presentation(self.fnpres)
 
       #  Read the slide layout components into a list of dictionaries
@@ -35,13 +144,469 @@ class Deck:
    def __str__(self):
       return f"Presentation file: {self.fnpres}"
 
-   #  Save the deck
-   def save(self, fn):
+   #  Save the deck; with deterministic=True, identical Deck/Slide content
+   #  always produces byte-identical output
+   def save(self, fn, deterministic=False):
       if (not isinstance(fn, str)):
          raise TypeError("--- filename must be a string to save presentation ---")
-      for s in range(0, len(self.slides)):
-         self.render_slide(self.slides[s])
-      self.pres.save(fn)
+      self.fnsave = fn
+      if (self.dry_run):
+         return True
+
+      self.render_all()
+      self.write(fn, deterministic)
+
+      #  The build is complete, so a later run has nothing to resume
+      if (self.journal is not None):
+         self.close()
+         if (exists(self.journal)):
+            os.remove(self.journal)
+         self.restored = {}
+         self.rendered = {}
+      return True
+
+   #  Close the journal file, if one is open
+   def close(self):
+      if (self.journal_file is not None):
+         self.journal_file.close()
+         self.journal_file = None
+      return True
+
+   #  Write the presentation as rendered so far to a file
+   def write(self, fn, deterministic=False):
+      if (deterministic):
+         self.set_slide_ids()
+         buf = io.BytesIO()
+         self.pres.save(buf)
+         with open(fn, "wb") as f:
+            f.write(self.repack(buf.getvalue()))
+      else:
+         self.pres.save(fn)
+      return True
+
+   #  Re-render the named slides in place in the rendered presentation, e.g.
+   #  after an exhibit changes, leaving the other slides as they are
+   def rerender(self, names):
+      slides = list(self.slides)
+      sldIdLst = self.pres.slides._sldIdLst
+      n = 0
+      for i in range(0, len(slides)):
+         if (slides[i].name not in names):
+            continue
+         old = sldIdLst.sldId_lst[self.ntemplate + i]
+         self.render_slide(slides[i])
+
+         #  python-pptx names a new slide part after the slide count, which
+         #  doesn't grow here, so give it a name no other part has
+         new = sldIdLst.sldId_lst[-1]
+         part = self.pres.part.related_slide(new.rId).part
+         part.partname = part.package.next_partname("/ppt/slides/slide%d.xml")
+
+         #  Move the new slide into the old one's place and drop the old one
+         old.addprevious(new)
+         sldIdLst.remove(old)
+         self.pres.part.drop_rel(old.rId)
+         n += 1
+      self.slides = slides
+      return n
+
+   #  Map each exhibit file used by the deck to the names of the slides that
+   #  use it
+   def dependencies(self):
+      deps = {}
+      for slide in self.slides:
+         if (slide.exhibits is not None):
+            for e in slide.exhibits:
+               path = os.path.abspath(e)
+               if (path not in deps):
+                  deps[path] = []
+               if (slide.name not in deps[path]):
+                  deps[path].append(slide.name)
+      return deps
+
+   #  Render all slides into a fresh copy of the template, so that repeated
+   #  saves don't accumulate slides, then copy in any merged presentations;
+   #  return the seconds spent on each rendered slide.  The template's own
+   #  slides are kept unless keep_template_slides is False.
+   def render_all(self):
+      slides = list(self.slides)
+      secs = []
+      self.pres = Presentation(self.fnpres)
+      if (not self.keep_template_slides):
+         sldIdLst = self.pres.slides._sldIdLst
+         for sldId in list(sldIdLst.sldId_lst):
+            sldIdLst.remove(sldId)
+            self.pres.part.drop_rel(sldId.rId)
+      self.ntemplate = len(self.pres.slides)
+      for s in range(0, len(slides)):
+         t0 = time.perf_counter()
+         if (self.journal is None):
+            self.render_slide(slides[s])
+         else:
+            #  Reuse slides rendered by an earlier build; charts can't be
+            #  restored from slide XML alone, so those are always rendered
+            key = self.render_key(slides[s])
+            if (key in self.rendered):
+               self.restore_slide(*self.rendered[key])
+            else:
+               self.render_slide(slides[s])
+               if (slides[s].num_charts() == 0):
+                  self.journal_rendered(key, slides[s])
+         secs.append(time.perf_counter() - t0)
+      self.slides = slides
+
+      if (len(self.imports) > 0):
+         media = self.media_index()
+         for fn in self.imports:
+            self.import_slides(fn, media)
+      return secs
+
+   #  Render the deck and break the output package down by slide: embedded
+   #  media (identified by hash, with media shared between slides counted
+   #  once), slide XML bytes, paragraphs and runs, and render time
+   def profile(self):
+      secs = self.render_all()
+      rendered = list(self.pres.slides)[self.ntemplate:self.ntemplate + len(self.slides)]
+
+      #  Package size as it would be written by save()
+      buf = io.BytesIO()
+      self.pres.save(buf)
+
+      report = {"deck": self.fnpres, "package_bytes": len(buf.getvalue()), "slides": []}
+      seen = {}
+      for i in range(0, len(self.slides)):
+         slide = self.slides[i]
+         part = rendered[i].part
+         entry = {"slide": slide.name, "xml_bytes": len(part.blob), "media_bytes": 0,
+                  "shared_media_bytes": 0, "media": [], "paragraphs": 0, "runs": 0,
+                  "render_seconds": secs[i]}
+
+         for rel in part.rels.values():
+            if ((rel.reltype != RT.IMAGE) | rel.is_external):
+               continue
+            blob = rel.target_part.blob
+            h = hashlib.sha1(blob).hexdigest()
+            if (h in seen):
+               entry["shared_media_bytes"] += len(blob)
+               shared_with = seen[h]
+            else:
+               entry["media_bytes"] += len(blob)
+               seen[h] = slide.name
+               shared_with = None
+            entry["media"].append({"part": str(rel.target_part.partname), "bytes": len(blob),
+                                   "sha1": h, "shared_with": shared_with})
+
+         #  Paragraphs and runs written to the Main, Margin and Footer text,
+         #  after adjacent runs are merged
+         for (runs, n) in ((slide.run_main, slide.num_main_bullets()), (slide.run_marg, slide.num_margin_bullets()),
+                           (slide.run_fn, slide.num_footnotes())):
+            if (n > 0):
+               for (level, segs) in self.collapse_runs(runs):
+                  entry["paragraphs"] += 1
+                  entry["runs"] += len(segs)
+
+         report["slides"].append(entry)
+      return report
+
+   #  Print a profile() report as a table, largest slides first
+   def show_profile(self, report=None):
+      if (report is None):
+         report = self.profile()
+      print("Package: {:,} bytes".format(report["package_bytes"]))
+      print("{:<24} {:>12} {:>12} {:>10} {:>6} {:>6} {:>9}".format("Slide", "Media", "Shared", "XML", "Paras", "Runs", "Render ms"))
+      print("----------------------------------------------------------------------------------")
+      for e in sorted(report["slides"], key=lambda e: e["media_bytes"] + e["xml_bytes"], reverse=True):
+         print("{:<24} {:>12,} {:>12,} {:>10,} {:>6} {:>6} {:>9.1f}".format(e["slide"][:24], e["media_bytes"], e["shared_media_bytes"],
+                                                                       e["xml_bytes"], e["paragraphs"], e["runs"], e["render_seconds"] * 1000))
+      print("----------------------------------------------------------------------------------")
+      return report["package_bytes"]
+
+   #  Assign each rendered slide a stable ID derived from its Slide name, so
+   #  IDs don't depend on the order in which slides were added
+   def set_slide_ids(self):
+      named = []
+      used = set()
+      for sldId in self.pres.slides._sldIdLst.sldId_lst:
+         name = self.pres.part.related_slide(sldId.rId).name
+         if (name != ""):
+            named.append((sldId, name))
+         else:
+            used.add(sldId.id)
+
+      span = self.MAX_SLIDE_ID - self.MIN_SLIDE_ID + 1
+      for (sldId, name) in named:
+         sid = self.MIN_SLIDE_ID + (zlib.crc32(name.encode("utf-8")) % span)
+         #  Probe forward on collision (e.g. two slides with the same name)
+         while (sid in used):
+            sid = self.MIN_SLIDE_ID + ((sid - self.MIN_SLIDE_ID + 1) % span)
+         sldId.id = sid
+         used.add(sid)
+      return True
+
+   #  Rewrite a saved package with fixed timestamps and a stable entry order,
+   #  and return it.  Embedded workbooks (chart data) are repacked the same
+   #  way, with the creation time stamped in their properties fixed too.
+   def repack(self, blob, embedded=False):
+      import zipfile
+      zin = zipfile.ZipFile(io.BytesIO(blob))
+      names = sorted(zin.namelist(), key=lambda n: (n != "[Content_Types].xml", n))
+      out = io.BytesIO()
+      with zipfile.ZipFile(out, "w") as zout:
+         for n in names:
+            data = zin.read(n)
+            if (re.search("^ppt/embeddings/.*\\.xlsx$", n)):
+               data = self.repack(data, embedded=True)
+            elif (embedded & (n == "docProps/core.xml")):
+               data = re.sub(b">[0-9T:Z-]+</dcterms:(created|modified)>", b">1980-01-01T00:00:00Z</dcterms:\\1>", data)
+            info = zipfile.ZipInfo(n, date_time=self.ZIP_EPOCH)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 0
+            info.external_attr = 0
+            zout.writestr(info, data)
+      zin.close()
+      return out.getvalue()
+
+   #  Merge the slides of another presentation (e.g. one saved by slidedeck)
+   #  into the deck; they are copied after the deck's own slides when it's
+   #  saved, without being rebuilt
+   def merge(self, fn):
+      if (not isinstance(fn, str)):
+         raise TypeError("--- presentation must be a PowerPoint filename string ---")
+      if (not exists(fn)):
+         raise FileNotFoundError("--- presentation file does not exist ---")
+      self.imports.append(fn)
+      return True
+
+   #  Index the media already in the deck's package by hash, and note the
+   #  highest number used for each kind of part name, so that merges can
+   #  dedupe media and name new parts without rescanning the package
+   def media_index(self):
+      media = {"sha1": {}, "next": {}}
+      for part in self.pres.part.package.iter_parts():
+         if (str(part.partname).startswith("/ppt/media/")):
+            media["sha1"][hashlib.sha1(part.blob).hexdigest()] = part
+         m = re.search("^(.*?)([0-9]+)(\\.[^./]+)$", str(part.partname))
+         if (m is not None):
+            tmpl = m.group(1) + "%d" + m.group(3)
+            media["next"][tmpl] = max(media["next"].get(tmpl, 0), int(m.group(2)))
+      return media
+
+   #  Return the next unused part name for a part like the one given
+   def next_partname(self, partname, media):
+      m = re.search("^(.*?)([0-9]+)(\\.[^./]+)$", str(partname))
+      if (m is None):
+         tmpl = re.sub("(\\.[^./]+)$", "%d\\1", str(partname))
+      else:
+         tmpl = m.group(1) + "%d" + m.group(3)
+      media["next"][tmpl] = media["next"].get(tmpl, 0) + 1
+      return PackURI(tmpl % media["next"][tmpl])
+
+   #  Return the placeholder signature of a layout: its (type, idx) pairs
+   def layout_signature(self, layout):
+      sig = []
+      for ph in layout.placeholders:
+         sig.append((int(ph.placeholder_format.type), ph.placeholder_format.idx))
+      return sorted(sig)
+
+   #  Find the deck layout matching a layout from another presentation: same
+   #  placeholder signature, else same name, else most placeholders in common
+   def match_layout(self, layout):
+      sig = self.layout_signature(layout)
+      best = None
+      best_n = -1
+      for lo in self.pres.slide_layouts:
+         lo_sig = self.layout_signature(lo)
+         if (lo_sig == sig):
+            return lo
+         n = len(set(lo_sig) & set(sig))
+         if (lo.name == layout.name):
+            n += len(sig) + 1
+         if (n > best_n):
+            best = lo
+            best_n = n
+      return best
+
+   #  Copy the relationships of a part from another presentation to a part in
+   #  this deck, deduping media (images, video and audio) by hash; return a
+   #  map of old to new rIds.  A part related more than once, such as a movie
+   #  (related as both media and video), is copied once.
+   def copy_rels(self, src_part, new_part, media):
+      rids = {}
+      copied = {}
+      for (rId, rel) in src_part.rels.items():
+         #  The slide's layout is already related; notes and links to other
+         #  slides aren't carried over
+         if (rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE, RT.SLIDE)):
+            continue
+         if (rel.is_external):
+            rids[rId] = new_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            continue
+
+         src = rel.target_part
+         if (src not in copied):
+            if (rel.reltype in (RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.AUDIO)):
+               h = hashlib.sha1(src.blob).hexdigest()
+               if (h not in media["sha1"]):
+                  media["sha1"][h] = PartFactory(self.next_partname(src.partname, media), src.content_type,
+                                                 new_part.package, src.blob)
+               copied[src] = media["sha1"][h]
+            else:
+               copied[src] = self.copy_part(src, media)
+         rids[rId] = new_part.relate_to(copied[src], rel.reltype)
+      return rids
+
+   #  Copy a part (e.g. a chart and its embedded workbook) from another
+   #  presentation into this deck's package
+   def copy_part(self, src_part, media):
+      new_part = PartFactory(self.next_partname(src_part.partname, media), src_part.content_type,
+                             self.pres.part.package, src_part.blob)
+      rids = self.copy_rels(src_part, new_part, media)
+      if (hasattr(new_part, "_element")):
+         self.remap_rids(new_part._element, rids)
+      return new_part
+
+   #  Point relationship references in copied XML at their new rIds.  A
+   #  hyperlink whose target wasn't carried over (such as a jump to another
+   #  slide) is removed, and any other such reference is dropped.  Empty
+   #  references, as in next slide or end show actions, are left alone.
+   def remap_rids(self, element, rids):
+      ns = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+      links = (qn("a:hlinkClick"), qn("a:hlinkHover"), qn("a:hlinkMouseOver"))
+      for el in list(element.iter()):
+         for (attr, val) in list(el.attrib.items()):
+            if ((not attr.startswith(ns)) or (val == "")):
+               continue
+            if (val in rids):
+               el.set(attr, rids[val])
+            elif (el.tag in links):
+               el.getparent().remove(el)
+               break
+            else:
+               del el.attrib[attr]
+      return True
+
+   #  Copy every slide of another presentation, with its media and other
+   #  related parts, onto the end of the deck's presentation
+   def import_slides(self, fn, media):
+      src = Presentation(fn)
+      layouts = {}
+      for src_slide in src.slides:
+         src_part = src_slide.part
+         lo_part = src_slide.slide_layout.part
+         if (lo_part not in layouts):
+            layouts[lo_part] = self.match_layout(src_slide.slide_layout)
+         new_part = self.pres.slides.add_slide(layouts[lo_part]).part
+         self.replace_slide_xml(new_part, src_part._element)
+         self.remap_rids(new_part._element, self.copy_rels(src_part, new_part, media))
+      return len(src.slides)
+
+   #  Replace a new slide's XML with a copy of another slide element
+   def replace_slide_xml(self, part, src_el):
+      el = part._element
+      for child in list(el):
+         el.remove(child)
+      for (attr, val) in src_el.attrib.items():
+         el.set(attr, val)
+      for child in src_el:
+         el.append(deepcopy(child))
+      return True
+
+   #  Checkpoint the deck to a journal file: slide specs (with their parsed
+   #  runs and layouts) are recorded as they're added, and slides as they're
+   #  rendered.  If the journal exists, it is left from a build that stopped
+   #  before saving, and its slides are restored for resume_slide() and
+   #  save() to reuse; the deck itself still holds only the slides the script
+   #  adds, in the order it adds them.  The journal is deleted once the deck
+   #  is saved.  Return the number of slides restored.
+   def checkpoint(self, fn):
+      if (not isinstance(fn, str)):
+         raise TypeError("--- journal must be a filename string ---")
+      self.close()
+      self.journal = fn
+      self.restored = {}
+      self.rendered = {}
+      if (exists(fn)):
+         import pickle
+         for rec in self.read_journal(fn):
+            if (rec[0] == "slide"):
+               self.restored[rec[1]] = pickle.loads(rec[2])
+            elif (rec[0] == "rendered"):
+               self.rendered[rec[1]] = rec[2:]
+      return len(self.restored)
+
+   #  Read the records in a journal, stopping at a record cut short by a crash
+   def read_journal(self, fn):
+      import pickle
+      recs = []
+      with open(fn, "rb") as f:
+         while (True):
+            head = f.read(4)
+            if (len(head) < 4):
+               break
+            blob = f.read(struct.unpack(">I", head)[0])
+            try:
+               recs.append(pickle.loads(zlib.decompress(blob)))
+            except Exception:
+               break
+      return recs
+
+   #  Append a record to the journal as a length-prefixed, compressed pickle;
+   #  each record is flushed so it survives the process crashing
+   def write_journal(self, rec):
+      import pickle
+      blob = zlib.compress(pickle.dumps(rec, pickle.HIGHEST_PROTOCOL), 1)
+      if (self.journal_file is None):
+         self.journal_file = open(self.journal, "ab")
+      self.journal_file.write(struct.pack(">I", len(blob)) + blob)
+      self.journal_file.flush()
+      return True
+
+   #  Add the slide of the given name restored from the journal, so a resumed
+   #  build can skip building it again; return False if there is none
+   def resume_slide(self, sn, index=None):
+      if (sn not in self.restored):
+         return False
+      return self.add_slide(self.restored[sn], index)
+
+   #  Return a key identifying a slide's spec and the state of its exhibit
+   #  files, used to find slides rendered by an earlier, checkpointed build
+   def render_key(self, slide):
+      import pickle
+      h = hashlib.sha1(pickle.dumps(slide, pickle.HIGHEST_PROTOCOL))
+      if (slide.exhibits is not None):
+         for e in slide.exhibits:
+            st = os.stat(e)
+            h.update("{}:{}:{}".format(e, st.st_size, st.st_mtime_ns).encode("utf-8"))
+      return h.hexdigest()
+
+   #  Record the slide just rendered in the journal: its layout, its XML and
+   #  the exhibit behind each image relationship
+   def journal_rendered(self, key, slide):
+      sldId = self.pres.slides._sldIdLst.sldId_lst[-1]
+      new_slide = self.pres.part.related_slide(sldId.rId)
+      lo = self.find_layout(slide)[0]
+      paths = {}
+      if (slide.exhibits is not None):
+         for e in slide.exhibits:
+            with open(e, "rb") as f:
+               paths[hashlib.sha1(f.read()).hexdigest()] = e
+      rels = []
+      for (rId, rel) in new_slide.part.rels.items():
+         if (rel.reltype == RT.IMAGE):
+            rels.append((rId, paths[rel.target_part.sha1]))
+      xml = etree.tostring(new_slide.part._element)
+      self.rendered[key] = (lo, xml, rels)
+      self.write_journal(("rendered", key, lo, xml, rels))
+      return True
+
+   #  Recreate a slide rendered by an earlier build from its journal record
+   def restore_slide(self, lo, xml, rels):
+      new_part = self.pres.slides.add_slide(self.pres.slide_layouts[lo]).part
+      self.replace_slide_xml(new_part, etree.fromstring(xml))
+      rids = {}
+      for (rId, path) in rels:
+         (image_part, rids[rId]) = new_part.get_or_add_image_part(path)
+      self.remap_rids(new_part._element, rids)
       return True
 
    #  Show deck filename
@@ -63,9 +628,18 @@ class Deck:
       lolist = self.find_layout(slide)
       lo = lolist[0]
 
-      if (lo == self.BAD_VALUE):
+      if ((lo == self.BAD_VALUE) & (not self.dry_run)):
          raise ValueError("--- couldn't find conforming layout ---")
 
+      #  Journal the slide unless it's already there unchanged
+      if (self.journal is not None):
+         import pickle
+         blob = pickle.dumps(slide, pickle.HIGHEST_PROTOCOL)
+         old = self.restored.get(slide.name)
+         if ((old is None) or (pickle.dumps(old, pickle.HIGHEST_PROTOCOL) != blob)):
+            self.write_journal(("slide", slide.name, blob, lo))
+            self.restored[slide.name] = slide
+
       #  If specified, ensure index is within the range of slides and then
       #  insert; otherwise, append it
       if (index is not None):
@@ -76,6 +650,139 @@ class Deck:
 
       return True
 
+   #  Check every slide without rendering and return a list of problems, each
+   #  a dictionary with the slide name, the check that failed and a message
+   def validate(self, workers=None):
+      from concurrent.futures import ThreadPoolExecutor
+      problems = []
+
+      #  Check each distinct exhibit file once, fanned out over a thread pool
+      paths = []
+      for slide in self.slides:
+         if (slide.exhibits is not None):
+            for e in slide.exhibits:
+               if (e not in paths):
+                  paths.append(e)
+      with ThreadPoolExecutor(max_workers=workers) as pool:
+         exhibit_msgs = dict(zip(paths, pool.map(self.check_exhibit, paths)))
+
+      for slide in self.slides:
+         for (check, msg) in slide.problems:
+            problems.append({"slide": slide.name, "check": check, "message": msg})
+
+         lo = self.find_layout(slide)[0]
+         if (lo == self.BAD_VALUE):
+            problems.append({"slide": slide.name, "check": "layout",
+                             "message": "no slide layout has placeholders for all of this slide's components"})
+
+         if (slide.exhibits is not None):
+            for e in slide.exhibits:
+               if (exhibit_msgs[e] is not None):
+                  problems.append({"slide": slide.name, "check": "exhibit",
+                                   "message": "{}: {}".format(e, exhibit_msgs[e])})
+
+         #  Overflow is only estimated for text that is rendered: bullets with
+         #  markers but no text leave runs behind without counting as bullets,
+         #  so the layout may have no placeholder for them
+         for (runs, n, label, get_ph) in ((slide.run_main, slide.num_main_bullets(), "main", self.get_main_ph),
+                                          (slide.run_marg, slide.num_margin_bullets(), "margin", self.get_margin_ph),
+                                          (slide.run_fn, slide.num_footnotes(), "footnote", self.get_footer_ph)):
+            msgs = self.check_runs(runs)
+            for msg in msgs:
+               problems.append({"slide": slide.name, "check": "markdown",
+                                "message": "{} text: {}".format(label, msg)})
+            if ((n > 0) and (len(msgs) == 0) and (lo != self.BAD_VALUE)):
+               msg = self.estimate_overflow(runs, lo, get_ph(lo)[-1])
+               if (msg is not None):
+                  problems.append({"slide": slide.name, "check": "overflow",
+                                   "message": "{} text: {}".format(label, msg)})
+
+      return problems
+
+   #  Print the problems found by validate() and return how many there were
+   def show_problems(self, workers=None):
+      problems = self.validate(workers)
+      for p in problems:
+         print("{}: [{}] {}".format(p["slide"], p["check"], p["message"]))
+      if (len(problems) == 0):
+         print("--- No problems found ---")
+      return len(problems)
+
+   #  Check that an exhibit exists, is a PNG or JPEG image and isn't too large;
+   #  return a description of the problem, or None
+   def check_exhibit(self, fn):
+      if (not exists(fn)):
+         return "file does not exist"
+      load_pil()
+      try:
+         with Image.open(fn) as img:
+            fmt = img.format
+      except OSError:
+         return "file is not a readable image"
+      if ((fmt != "JPEG") & (fmt != "PNG")):
+         return "exhibits must be PNG or JPEG images, not {}".format(fmt)
+      nbytes = getsize(fn)
+      if (nbytes > self.MAX_EXHIBIT_BYTES):
+         return "file is {:.1f} MB, over the {:.1f} MB limit".format(nbytes / 1048576, self.MAX_EXHIBIT_BYTES / 1048576)
+      return None
+
+   #  Check that a list of formatting "runs" can be rendered; return a list of
+   #  problem descriptions
+   def check_runs(self, runs):
+      msgs = []
+      para = False
+      run = False
+      for r in runs:
+         if (re.search("ParaLevel", r)):
+            (junk, level) = r.split("Level")
+            if ((not level.isdigit()) or (int(level) > 8)):
+               msgs.append("bullet level {} is outside the range 1-8".format(level))
+            para = True
+            run = False
+         elif (re.search("::", r)):
+            parts = r.split("::")
+            if (not para):
+               msgs.append("formatting directive before the first bullet")
+            elif (len(parts) != 4):
+               msgs.append("malformed formatting directive '{}'".format(r))
+            elif (not parts[1].isdigit()):
+               msgs.append("font size '{}' is not a number".format(parts[1]))
+            run = True
+         elif (not run):
+            msgs.append("text '{}' appears before any bullet".format(r))
+      return msgs
+
+   #  Estimate whether a list of formatting "runs" fits in a placeholder of the
+   #  given layout; return a description of the overflow, or None
+   def estimate_overflow(self, runs, lo, idx):
+      ph = self.pres.slide_layouts[lo].placeholders.get(idx=idx)
+      if ((ph is None) or (ph.width is None) or (ph.height is None)):
+         return None
+
+      #  Text frames are rendered with no left margin; allow for the default
+      #  right, top and bottom margins (0.1 and 0.05 inches)
+      width = ph.width / 12700 - 7.2
+      height = ph.height / 12700 - 7.2
+
+      needed = 0.0
+      nchars = 0
+      size = 0
+      for r in runs + ["--- ParaLevel1"]:
+         if (re.search("ParaLevel", r)):
+            if (size > 0):
+               lines = max(1, math.ceil(nchars * size * self.AVG_CHAR_WIDTH / width))
+               needed += lines * size * self.LINE_SPACING
+            nchars = 0
+            size = 0
+         elif (re.search("::", r)):
+            size = max(size, int(r.split("::")[1]))
+         else:
+            nchars += len(r)
+
+      if (needed > height):
+         return "needs about {:.1f} in of height but the placeholder is {:.1f} in tall".format(needed / 72, height / 72)
+      return None
+
    #  Render Slide object(s) to the deck
    def render_slide(self, slide, layout=None, index=None):
       #  Check slide is a Slide object
@@ -107,6 +814,7 @@ class Deck:
       else:
          self.slides.append(slide)
       new_slide = self.pres.slides.add_slide(self.pres.slide_layouts[lo])
+      new_slide.name = slide.name
 
       #  Fill the title placeholder, if applicable
       if (slide.title is not None):
@@ -121,6 +829,34 @@ class Deck:
             new_slide.placeholders[ph.pop()].insert_picture(slide.exhibits[i])
             i += 1
 
+      #  Fill the Table placeholders, if applicable, with a header row of
+      #  column names followed by the column values
+      if (slide.num_tables() > 0):
+         ph = self.get_table_ph(lo)
+         for (columns, fmt) in slide.tables:
+            headers = list(columns.keys())
+            nrows = len(columns[headers[0]])
+            table = new_slide.placeholders[ph.pop()].insert_table(nrows + 1, len(headers)).table
+            for j in range(0, len(headers)):
+               table.cell(0, j).text = str(headers[j])
+               col = columns[headers[j]]
+               for i in range(0, nrows):
+                  table.cell(i + 1, j).text = self.format_cell(col[i], fmt)
+
+      #  Fill the Chart placeholders, if applicable; the first column holds the
+      #  categories and each remaining column is a series
+      if (slide.num_charts() > 0):
+         ph = self.get_chart_ph(lo)
+         for (columns, kind) in slide.charts:
+            names = list(columns.keys())
+            chart_data = CategoryChartData()
+            chart_data.categories = columns[names[0]]
+            for n in names[1:]:
+               chart_data.add_series(str(n), columns[n])
+            chart_type = {"line": XL_CHART_TYPE.LINE, "bar": XL_CHART_TYPE.BAR_CLUSTERED,
+                          "column": XL_CHART_TYPE.COLUMN_CLUSTERED}[kind]
+            new_slide.placeholders[ph.pop()].insert_chart(chart_type, chart_data)
+
       #  Fill the Main text box with bullets, if applicable
       print("Rendering............")
       if (slide.num_main_bullets() > 0):
@@ -131,24 +867,8 @@ class Deck:
          tf_main.margin_left = 0
          tf_main.vertical_anchor = MSO_ANCHOR.TOP
          tf_main.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-         #  Loop through and implement the formatting "runs"
-         for i in range(0, len(slide.run_main)):
-            if (re.search("ParaLevel", slide.run_main[i])):
-               (junk, level) = slide.run_main[i].split("Level")
-               p = tf_main.add_paragraph()
-               p.level = int(level)
-               p.alignment = PP_ALIGN.LEFT
-            elif (re.search("::", slide.run_main[i])):
-               (fnm, fsz, bbold, bitalic) = slide.run_main[i].split("::")
-               run = p.add_run()
-               run.font.name = fnm
-               run.font.size = Pt(int(fsz))
-               if (bbold == "True"):
-                  run.font.bold = True
-               if (bitalic == "True"):
-                  run.font.italic = True
-            else:
-               run.text = slide.run_main[i]
+         #  Implement the formatting "runs"
+         self.fill_text_frame(tf_main, slide.run_main)
 
       #  Fill the Margin text box with bullets, if applicable
       if (slide.num_margin_bullets() > 0):
@@ -159,24 +879,8 @@ class Deck:
          tf_margin.margin_left = 0
          tf_margin.vertical_anchor = MSO_ANCHOR.TOP
          tf_margin.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-         #  Loop through and implement the formatting "runs"
-         for i in range(0, len(slide.run_marg)):
-            if (re.search("ParaLevel", slide.run_marg[i])):
-               (junk, level) = slide.run_marg[i].split("Level")
-               p = tf_margin.add_paragraph()
-               p.level = int(level)
-               p.alignment = PP_ALIGN.LEFT
-            elif (re.search("::", slide.run_marg[i])):
-               (fnm, fsz, bbold, bitalic) = slide.run_marg[i].split("::")
-               run = p.add_run()
-               run.font.name = fnm
-               run.font.size = Pt(int(fsz))
-               if (bbold == "True"):
-                  run.font.bold = True
-               if (bitalic == "True"):
-                  run.font.italic = True
-            else:
-               run.text = slide.run_marg[i]
+         #  Implement the formatting "runs"
+         self.fill_text_frame(tf_margin, slide.run_marg)
 
       #  Fill the footer with footnotes, if applicable
       if (slide.num_footnotes() > 0):
@@ -187,27 +891,90 @@ class Deck:
          tf_footer.margin_left = 0
          tf_footer.vertical_anchor = MSO_ANCHOR.TOP
          tf_footer.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-         #  Loop through and implement the formatting "runs"
-         for i in range(0, len(slide.run_fn)):
-            if (re.search("ParaLevel", slide.run_fn[i])):
-               (junk, level) = slide.run_fn[i].split("Level")
-               p = tf_footer.add_paragraph()
-               p.level = int(level)
-               p.alignment = PP_ALIGN.LEFT
-            elif (re.search("::", slide.run_fn[i])):
-               (fnm, fsz, bbold, bitalic) = slide.run_fn[i].split("::")
-               run = p.add_run()
-               run.font.name = fnm
-               run.font.size = Pt(int(fsz))
-               if (bbold == "True"):
-                  run.font.bold = True
-               if (bitalic == "True"):
-                  run.font.italic = True
-            else:
-               run.text = slide.run_fn[i]
+         #  Implement the formatting "runs"
+         self.fill_text_frame(tf_footer, slide.run_fn)
 
       return (len(self.slides) - 1)
 
+   #  Collapse a list of formatting "runs" into paragraphs of (level, segments),
+   #  where each segment is a ((font, size, bold, italic), text) pair; runs
+   #  without text are dropped and adjacent runs formatted alike are merged
+   def collapse_runs(self, runs):
+      paras = []
+      fmt = None
+      for r in runs:
+         if (re.search("ParaLevel", r)):
+            (junk, level) = r.split("Level")
+            paras.append((int(level), []))
+         elif (re.search("::", r)):
+            (fnm, fsz, bbold, bitalic) = r.split("::")
+            fmt = (fnm, int(fsz), bbold == "True", bitalic == "True")
+         elif (r != ""):
+            segs = paras[-1][1]
+            if ((len(segs) > 0) and (segs[-1][0] == fmt)):
+               segs[-1] = (fmt, segs[-1][1] + r)
+            else:
+               segs.append((fmt, r))
+      return paras
+
+   #  Fill a text frame from a list of formatting "runs".  The most common
+   #  formatting at each bullet level is set once in the frame's list style
+   #  (a:lvlNpPr/a:defRPr), so only runs that differ from it carry their own
+   #  font properties.
+   def fill_text_frame(self, tf, runs):
+      paras = self.collapse_runs(runs)
+
+      #  Each level's default formatting is the one covering the most characters
+      chars = {}
+      for (level, segs) in paras:
+         if (level not in chars):
+            chars[level] = {}
+         for (fmt, text) in segs:
+            chars[level][fmt] = chars[level].get(fmt, 0) + len(text)
+      dflts = {}
+      for level in chars.keys():
+         if (len(chars[level]) > 0):
+            dflts[level] = max(chars[level], key=chars[level].get)
+         else:
+            dflts[level] = None
+
+      #  Write the list style for each level used
+      txBody = tf._txBody
+      lstStyle = txBody.find(qn("a:lstStyle"))
+      if (lstStyle is None):
+         lstStyle = etree.Element(qn("a:lstStyle"))
+         txBody.find(qn("a:bodyPr")).addnext(lstStyle)
+      for child in list(lstStyle):
+         lstStyle.remove(child)
+      for level in sorted(dflts.keys()):
+         dflt = dflts[level]
+         lvlPr = etree.SubElement(lstStyle, qn("a:lvl{}pPr".format(level + 1)), algn="l")
+         if (dflt is not None):
+            defRPr = etree.SubElement(lvlPr, qn("a:defRPr"), sz=str(dflt[1] * 100))
+            if (dflt[2]):
+               defRPr.set("b", "1")
+            if (dflt[3]):
+               defRPr.set("i", "1")
+            etree.SubElement(defRPr, qn("a:latin"), typeface=dflt[0])
+
+      #  Add the paragraphs, setting only the properties that differ
+      for (level, segs) in paras:
+         p = tf.add_paragraph()
+         p.level = level
+         dflt = dflts[level]
+         for (fmt, text) in segs:
+            run = p.add_run()
+            run.text = text
+            if (fmt[0] != dflt[0]):
+               run.font.name = fmt[0]
+            if (fmt[1] != dflt[1]):
+               run.font.size = Pt(fmt[1])
+            if (fmt[2] != dflt[2]):
+               run.font.bold = fmt[2]
+            if (fmt[3] != dflt[3]):
+               run.font.italic = fmt[3]
+      return len(paras)
+
    #  Delete a Slide object by name from the deck
    def del_slide(self, sn):
       numslb = len(self.slides)
@@ -250,6 +1017,12 @@ class Deck:
          if (slide.num_footnotes() > 0):
             if (self.num_footer_ph(i) == 0):
                c = False
+         if (slide.num_tables() > 0):
+            if (self.num_table_ph(i) < slide.num_tables()):
+               c = False
+         if (slide.num_charts() > 0):
+            if (self.num_chart_ph(i) < slide.num_charts()):
+               c = False
 
          if (c == True):
             ok_los.append(i)
@@ -348,6 +1121,14 @@ class Deck:
             ph.append(self.slide_los[i][key])
       return ph
 
+   #  Return Chart placeholders in specified slide layout
+   def get_chart_ph(self, i):
+      ph = []
+      for key in self.slide_los[i].keys():
+         if (re.search("^Chart", key)):
+            ph.append(self.slide_los[i][key])
+      return ph
+
    #  Return number of Picture placeholders in specified slide layout
    def num_picture_ph(self, i):
       p = 0
@@ -420,14 +1201,42 @@ class Deck:
             p += 1
       return p
 
+   #  Return number of Chart placeholders in specified slide layout
+   def num_chart_ph(self, i):
+      p = 0
+      for key in self.slide_los[i].keys():
+         if (re.search("^Chart", key)):
+            p += 1
+      return p
+
+   #  Format a table cell value: blank for missing, whole numbers without
+   #  decimals and other numbers with the table's format string
+   def format_cell(self, v, fmt):
+      if (v is None):
+         return ""
+      if (isinstance(v, float)):
+         if (v.is_integer()):
+            return str(int(v))
+         return fmt.format(v)
+      return str(v)
+
 class Slide:
-   def __init__(self, name, title=None, exhibits=None, bullets_main=None, bullets_marg=None, footnotes=None):
+   #  Default for a new slide's defer_checks: when set, exhibit and Markdown
+   #  problems are recorded in self.problems rather than raised, so
+   #  Deck.validate() can report them all at once
+   DEFER_CHECKS = False
+
+   def __init__(self, name, title=None, exhibits=None, bullets_main=None, bullets_marg=None, footnotes=None,
+                defer_checks=None):
       self.name = name
+      self.defer_checks = self.DEFER_CHECKS if (defer_checks is None) else defer_checks
       self.title = title
       self.exhibits = exhibits
       self.bullets_main = bullets_main
       self.bullets_marg = bullets_marg
       self.footnotes = footnotes
+      self.tables = None
+      self.charts = None
 
       #  Initialize arrays to hold Markdown-style "runs" for main and margin
       #  bullets and footnotes
@@ -435,6 +1244,9 @@ class Slide:
       self.run_main = []
       self.run_fn = []
 
+      #  Problems recorded while defer_checks is set, as (check, message) pairs
+      self.problems = []
+
       if (self.title is not None):
          if (not isinstance(self.title, str)):
             raise TypeError("--- title must be a string ---")
@@ -442,7 +1254,8 @@ class Slide:
       if (self.exhibits is not None):
          if (not isinstance(self.exhibits, list)):
             raise TypeError("--- exhibits must be a list ---")
-         else:
+         elif (not self.defer_checks):
+            load_pil()
             for e in self.exhibits:
                img = Image.open(e)
                fmt = img.get_format_mimetype()
@@ -505,6 +1318,20 @@ class Slide:
       else:
          return 0
 
+   #  Return number of tables
+   def num_tables(self):
+      if (self.tables is not None):
+         return len(self.tables)
+      else:
+         return 0
+
+   #  Return number of charts
+   def num_charts(self):
+      if (self.charts is not None):
+         return len(self.charts)
+      else:
+         return 0
+
    #  Add title
    def add_title(self, title):
       if (isinstance(title, str)):
@@ -520,7 +1347,15 @@ class Slide:
 
    #  Add exhibit
    def add_exhibit(self, exhibit):
+      #  Defer the image check to Deck.validate() if requested
+      if (self.defer_checks):
+         if (self.exhibits is None):
+            self.exhibits = []
+         self.exhibits.append(exhibit)
+         return True
+
       #  Add exhibit to the exhibits list if it is a PNG or JPEG image
+      load_pil()
       img = Image.open(exhibit)
       fmt = img.get_format_mimetype()
       if ((fmt != "image/jpeg") & (fmt !="image/png")):
@@ -535,6 +1370,33 @@ class Slide:
    def get_exhibits(self):
       return self.exhibits
 
+   #  Add a table from a dictionary of columns ({header: [values]}), such as
+   #  stata_columns() returns; fmt formats numbers that aren't whole
+   def add_table(self, columns, fmt="{:,.2f}"):
+      if ((not isinstance(columns, dict)) or (len(columns) == 0)):
+         raise TypeError("--- table must be a non-empty dictionary of columns ---")
+      if (len(set(len(c) for c in columns.values())) > 1):
+         raise ValueError("--- table columns must all be the same length ---")
+      if (self.tables is None):
+         self.tables = []
+      self.tables.append((columns, fmt))
+      return True
+
+   #  Add a chart from a dictionary of columns ({name: [values]}), such as
+   #  stata_columns() returns; the first column holds the categories and each
+   #  remaining column is a series
+   def add_chart(self, columns, kind="line"):
+      if ((not isinstance(columns, dict)) or (len(columns) < 2)):
+         raise TypeError("--- chart must be a dictionary of a category column and one or more series ---")
+      if (len(set(len(c) for c in columns.values())) > 1):
+         raise ValueError("--- chart columns must all be the same length ---")
+      if (kind not in ("line", "bar", "column")):
+         raise ValueError("--- chart kind must be line, bar or column ---")
+      if (self.charts is None):
+         self.charts = []
+      self.charts.append((columns, kind))
+      return True
+
    #  Add main bullet(s)
    def add_main_bullets(self, bullet):
       #  Add bullet(s) to the bullets_main list if it is a string object
@@ -661,6 +1523,7 @@ class Slide:
          raise TypeError("--- index must be an integer ---")
 
       #  Replace an exhibit in the list if it's a PNG or JPEG file
+      load_pil()
       img = Image.open(exhibit)
       fmt = img.get_format_mimetype()
       if ((fmt != "image/jpeg") & (fmt !="image/png")):
@@ -750,6 +1613,9 @@ class Slide:
             target = "main"
          else:
             target = "footnote"
+      elif (self.defer_checks):
+         self.problems.append(("markdown", "'{}' must start with one or more \"+\" (main), \"-\" (margin) or \"^\" (footnote)".format(s)))
+         return 1
       else:
          raise SyntaxError('--- must start with one or more "+" (main), "-" (margin) or "^" (footnote) ---')
 
@@ -865,3 +1731,235 @@ class Slide:
             self.run_fn.append(runtext)
 
       return 0
+
+#  Run a build script with saving disabled (and, optionally, exhibit and
+#  Markdown errors deferred), and return the decks it created, ready to be
+#  rendered; the script's own output goes to stderr.  The class defaults are
+#  only changed while the script runs, so each deck and slide keeps the
+#  setting it was created with.
+def load_decks(script, defer_checks=True):
+   import runpy
+   Deck.DRY_RUN = True
+   Slide.DEFER_CHECKS = defer_checks
+   try:
+      with redirect_stdout(sys.stderr):
+         ns = runpy.run_path(script, run_name="__main__")
+   finally:
+      Deck.DRY_RUN = False
+      Slide.DEFER_CHECKS = False
+   decks = []
+   for v in ns.values():
+      if (isinstance(v, Deck)):
+         v.dry_run = False
+         decks.append(v)
+   return decks
+
+#  Return the modification time and size of each file, or None if missing
+def file_states(paths):
+   states = {}
+   for path in paths:
+      try:
+         st = os.stat(path)
+         states[path] = (st.st_mtime_ns, st.st_size)
+      except OSError:
+         states[path] = None
+   return states
+
+#  Render a deck and write it to its output file, replacing the file in one
+#  step so viewers never see a partly written deck
+def write_atomic(deck, deterministic=False):
+   tmp = deck.fnsave + ".tmp"
+   deck.write(tmp, deterministic)
+   os.replace(tmp, deck.fnsave)
+   return True
+
+#  Build the decks of a Python script, then keep them in memory and poll the
+#  script, any other bullet sources and every exhibit for changes.  A changed
+#  exhibit re-renders only the slides that use it; a changed script or source
+#  reruns the script and re-renders only the slides whose specs changed.
+def watch(script, sources=None, interval=0.5, deterministic=False):
+   sources = [os.path.abspath(s) for s in ([script] + (sources or []))]
+
+   decks = []
+   with redirect_stdout(sys.stderr):
+      for d in load_decks(script, defer_checks=False):
+         if (d.fnsave is None):
+            print("--- {} is never saved, so it isn't watched ---".format(d.fnpres))
+            continue
+         d.render_all()
+         write_atomic(d, deterministic)
+         decks.append(d)
+   print("Watching {} deck(s); press Ctrl-C to stop".format(len(decks)))
+
+   states = file_states(sources)
+   for d in decks:
+      states.update(file_states(d.dependencies().keys()))
+
+   #  After a failed rebuild the rendered decks may be half updated, so the
+   #  next change renders them in full
+   stale = False
+   try:
+      while (True):
+         time.sleep(interval)
+         now = file_states(states.keys())
+         changed = [path for path in now.keys() if (now[path] != states[path])]
+         if (len(changed) == 0):
+            continue
+         states = now
+
+         t0 = time.perf_counter()
+         try:
+            with redirect_stdout(sys.stderr):
+               if (len(set(changed) & set(sources)) > 0):
+                  #  Exhibits that changed along with the script still need
+                  #  their slides re-rendered
+                  exhibits = [path for path in changed if (path not in sources)]
+                  decks = rebuild_changed(script, decks, deterministic, exhibits)
+               elif (stale):
+                  for d in decks:
+                     d.render_all()
+                     write_atomic(d, deterministic)
+               else:
+                  for d in decks:
+                     deps = d.dependencies()
+                     names = []
+                     for path in changed:
+                        names.extend(deps.get(path, []))
+                     if (len(names) > 0):
+                        d.rerender(names)
+                        write_atomic(d, deterministic)
+         except Exception as e:
+            print("--- rebuild failed: {} ---".format(e))
+            stale = True
+            continue
+         stale = False
+
+         #  Start watching any exhibits the rebuilt decks added
+         for d in decks:
+            for (path, state) in file_states(d.dependencies().keys()).items():
+               if (path not in states):
+                  states[path] = state
+         print("Rebuilt after changes to {} in {:.2f}s".format(", ".join(os.path.basename(c) for c in changed),
+                                                             time.perf_counter() - t0))
+   except KeyboardInterrupt:
+      pass
+   return 0
+
+#  Rerun a watched build script and update each deck from it: decks whose
+#  slide names, order or template changed are rendered again in full,
+#  otherwise only slides whose specs changed, or that use one of the changed
+#  exhibit files given, are re-rendered
+def rebuild_changed(script, decks, deterministic=False, exhibits=None):
+   import pickle
+   old = {}
+   for d in decks:
+      old[d.fnsave] = d
+
+   rebuilt = []
+   for nd in load_decks(script, defer_checks=False):
+      if (nd.fnsave is None):
+         continue
+      od = old.get(nd.fnsave)
+      if ((od is None) or (od.fnpres != nd.fnpres) or (od.imports != nd.imports) or
+          ([s.name for s in od.slides] != [s.name for s in nd.slides])):
+         nd.render_all()
+         write_atomic(nd, deterministic)
+         rebuilt.append(nd)
+         continue
+
+      names = []
+      for i in range(0, len(nd.slides)):
+         if (pickle.dumps(nd.slides[i]) != pickle.dumps(od.slides[i])):
+            names.append(nd.slides[i].name)
+      od.slides = nd.slides
+      deps = od.dependencies()
+      for path in (exhibits or []):
+         for name in deps.get(path, []):
+            if (name not in names):
+               names.append(name)
+      if (len(names) > 0):
+         od.rerender(names)
+         write_atomic(od, deterministic)
+      rebuilt.append(od)
+   return rebuilt
+
+#  Command-line interface
+def main(argv=None):
+   import argparse
+   import json
+   parser = argparse.ArgumentParser(prog="slidedeck", description="Create PowerPoint slides from Stata or Python")
+   cmds = parser.add_subparsers(dest="command", required=True)
+
+   check = cmds.add_parser("check", help="validate the decks built by a Python script without rendering them")
+   check.add_argument("script", help="Python script that builds one or more Deck objects")
+   check.add_argument("--workers", type=int, default=None, help="threads used to check exhibits")
+   check.add_argument("--json", action="store_true", help="print the report as JSON")
+
+   profile = cmds.add_parser("profile", help="break down the size and render time of the decks built by a Python script")
+   profile.add_argument("script", help="Python script that builds one or more Deck objects")
+   profile.add_argument("--json", action="store_true", help="print the report as JSON")
+
+   merge = cmds.add_parser("merge", help="concatenate the slides of several presentations")
+   merge.add_argument("output", help="presentation to write")
+   merge.add_argument("sources", nargs="+", help="presentations whose slides are copied, in order")
+   merge.add_argument("--template", default=None, help="presentation whose layouts the slides are mapped to; its own slides are not copied (default: the first source)")
+   merge.add_argument("--deterministic", action="store_true", help="write byte-reproducible output")
+
+   watch_cmd = cmds.add_parser("watch", help="rebuild the decks of a Python script as its exhibits and sources change")
+   watch_cmd.add_argument("script", help="Python script that builds and saves one or more Deck objects")
+   watch_cmd.add_argument("--source", action="append", default=[], help="another file the script reads bullets from (repeatable)")
+   watch_cmd.add_argument("--interval", type=float, default=0.5, help="seconds between checks for changes")
+   watch_cmd.add_argument("--deterministic", action="store_true", help="write byte-reproducible output")
+
+   args = parser.parse_args(argv)
+
+   if (args.command == "check"):
+      report = []
+      for d in load_decks(args.script):
+         for p in d.validate(args.workers):
+            p["deck"] = d.fnsave if (d.fnsave is not None) else d.fnpres
+            report.append(p)
+      if (args.json):
+         print(json.dumps(report, indent=2))
+      else:
+         for p in report:
+            print("{}: {}: [{}] {}".format(p["deck"], p["slide"], p["check"], p["message"]))
+         print("{} problem(s) found".format(len(report)))
+      return 1 if (len(report) > 0) else 0
+
+   if (args.command == "merge"):
+      #  The first source doubles as the template unless one is given, in
+      #  which case only its layouts are used
+      sources = list(args.sources)
+      keep = (args.template is None)
+      if (keep):
+         args.template = sources.pop(0)
+      d = Deck(args.template)
+      d.keep_template_slides = keep
+      for fn in sources:
+         d.merge(fn)
+      d.save(args.output, deterministic=args.deterministic)
+      print("{} slide(s) written to {}".format(len(d.pres.slides), args.output))
+      return 0
+
+   if (args.command == "watch"):
+      return watch(args.script, args.source, args.interval, args.deterministic)
+
+   if (args.command == "profile"):
+      decks = load_decks(args.script, defer_checks=False)
+      with redirect_stdout(sys.stderr):
+         reports = [d.profile() for d in decks]
+      if (args.json):
+         print(json.dumps(reports, indent=2))
+      else:
+         for i in range(0, len(decks)):
+            decks[i].show_profile(reports[i])
+      return 0
+
+   return 0
+
+if __name__ == "__main__":
+   #  Call main() from the importable module so that build scripts doing
+   #  "from slidedeck import Deck" share the same classes
+   from slidedeck import main
+   sys.exit(main())
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+#  The template bundled with the repo
+@pytest.fixture
+def template():
+   return os.path.join(ROOT, "dfsslides.pptx")
+
+
+#  Write a small PNG exhibit and return its path
+@pytest.fixture
+def exhibit(tmp_path):
+   from PIL import Image
+
+   def make(name, color="red"):
+      fn = str(tmp_path / (name + ".png"))
+      Image.new("RGB", (200, 150), color).save(fn)
+      return fn
+   return make
+
+
+#  The bundled template with the two body placeholders of its "Two Content"
+#  layout turned into a table and a chart placeholder
+@pytest.fixture
+def chart_template(tmp_path):
+   from pptx import Presentation
+
+   pres = Presentation(os.path.join(ROOT, "dfsslides.pptx"))
+   for ph in pres.slide_layouts[3].placeholders:
+      if (ph.name == "Main1"):
+         (ph.name, kind) = ("Table1", "tbl")
+      elif (ph.name == "Main2"):
+         (ph.name, kind) = ("Chart1", "chart")
+      else:
+         continue
+      ph._element.ph.set("type", kind)
+   fn = str(tmp_path / "charts.pptx")
+   pres.save(fn)
+   return fn
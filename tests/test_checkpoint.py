@@ -0,0 +1,111 @@
+import os
+
+import pytest
+from pptx import Presentation
+
+from slidedeck import Deck, Slide
+
+
+def make_slide(name, exhibit=None):
+   s = Slide(name)
+   s.add_title("T" + name)
+   if (exhibit is None):
+      s.add_main_bullets("+ slide ** " + name + " **")
+   else:
+      s.add_exhibit(exhibit)
+      s.add_margin_bullets("- slide " + name)
+   return s
+
+
+def titles(fn):
+   return [s.shapes.title.text for s in Presentation(fn).slides]
+
+
+def test_save_removes_journal(template, tmp_path):
+   journal = str(tmp_path / "build.journal")
+   out = str(tmp_path / "out.pptx")
+
+   d = Deck(template)
+   assert d.checkpoint(journal) == 0
+   for name in ("A", "B", "C"):
+      d.add_slide(make_slide(name))
+   d.save(out)
+   assert not os.path.exists(journal)
+   assert titles(out) == ["TA", "TB", "TC"]
+
+   #  A later run starts from scratch, so its order and slides are its own
+   d = Deck(template)
+   assert d.checkpoint(journal) == 0
+   for name in ("C", "A"):
+      d.add_slide(make_slide(name))
+   d.save(out)
+   assert titles(out) == ["TC", "TA"]
+
+
+def test_resume_follows_script(template, tmp_path):
+   journal = str(tmp_path / "build.journal")
+   out = str(tmp_path / "out.pptx")
+
+   d = Deck(template)
+   d.checkpoint(journal)
+   for name in ("A", "B"):
+      d.add_slide(make_slide(name))
+   d.close()
+
+   d = Deck(template)
+   assert d.checkpoint(journal) == 2
+   assert d.slides == []
+   d.add_slide(make_slide("C"))
+   assert d.resume_slide("B")
+   assert not d.resume_slide("D")
+   d.save(out)
+   assert titles(out) == ["TC", "TB"]
+   assert not os.path.exists(journal)
+
+
+def test_resume_after_failed_save(template, exhibit, tmp_path):
+   journal = str(tmp_path / "build.journal")
+   names = ("A", "B", "C")
+   exhibits = {"A": exhibit("a", "red"), "C": exhibit("c", "blue")}
+
+   expected = str(tmp_path / "expected.pptx")
+   d = Deck(template)
+   for name in names:
+      d.add_slide(make_slide(name, exhibits.get(name)))
+   d.save(expected, deterministic=True)
+
+   #  Every slide is rendered and journalled before the write fails
+   d = Deck(template)
+   d.checkpoint(journal)
+   for name in names:
+      d.add_slide(make_slide(name, exhibits.get(name)))
+   with pytest.raises(OSError):
+      d.save(str(tmp_path / "missing" / "out.pptx"))
+   d.close()
+   assert os.path.exists(journal)
+
+   out = str(tmp_path / "out.pptx")
+   d = Deck(template)
+   assert d.checkpoint(journal) == 3
+   assert len(d.rendered) == 3
+   for name in names:
+      assert d.resume_slide(name)
+   d.save(out, deterministic=True)
+   with open(expected, "rb") as f1, open(out, "rb") as f2:
+      assert f1.read() == f2.read()
+
+
+def test_resume_slide_at_index(template, tmp_path):
+   journal = str(tmp_path / "build.journal")
+   d = Deck(template)
+   d.checkpoint(journal)
+   d.add_slide(make_slide("A"))
+   d.close()
+
+   d = Deck(template)
+   d.checkpoint(journal)
+   d.add_slide(make_slide("B"))
+   assert d.resume_slide("A", index=0)
+   out = str(tmp_path / "out.pptx")
+   d.save(out)
+   assert titles(out) == ["TA", "TB"]
@@ -0,0 +1,52 @@
+import time
+
+from pptx import Presentation
+
+from slidedeck import Deck, Slide
+
+
+def build(template, exhibit, order=("pics", "chart", "text")):
+   slides = {}
+   s = Slide("pics")
+   s.add_title("Pictures")
+   s.add_exhibit(exhibit("a", "red"))
+   s.add_margin_bullets("- red")
+   slides["pics"] = s
+   s = Slide("chart")
+   s.add_title("Chart")
+   s.add_table({"year": [2021, 2022], "rgdp": [19.5, None]})
+   s.add_chart({"year": ["2021", "2022"], "rgdp": [19.5, 20.1]})
+   slides["chart"] = s
+   s = Slide("text")
+   s.add_title("Text")
+   s.add_main_bullets("+ some ** bold ** text")
+   slides["text"] = s
+
+   d = Deck(template)
+   for name in order:
+      d.add_slide(slides[name])
+   return d
+
+
+def read(fn):
+   with open(fn, "rb") as f:
+      return f.read()
+
+
+def test_saves_are_identical(chart_template, exhibit, tmp_path):
+   (fn1, fn2) = (str(tmp_path / "one.pptx"), str(tmp_path / "two.pptx"))
+   build(chart_template, exhibit).save(fn1, deterministic=True)
+   #  Zip timestamps have a two second resolution
+   time.sleep(2.1)
+   build(chart_template, exhibit).save(fn2, deterministic=True)
+   assert read(fn1) == read(fn2)
+
+
+def test_slide_ids_follow_names(chart_template, exhibit, tmp_path):
+   ids = []
+   for order in (("pics", "chart", "text"), ("text", "pics", "chart")):
+      fn = str(tmp_path / "out.pptx")
+      build(chart_template, exhibit, order).save(fn, deterministic=True)
+      ids.append({s.shapes.title.text: s.slide_id for s in Presentation(fn).slides})
+   assert ids[0] == ids[1]
+   assert len(set(ids[0].values())) == 3
@@ -0,0 +1,26 @@
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#  Cumulative -X importtime budget for "import slidedeck", in microseconds;
+#  importing python-pptx alone takes several times this
+IMPORT_BUDGET_US = 100000
+
+
+def test_import_is_lazy():
+   code = ("import sys, slidedeck; "
+           "print(' '.join(m for m in ('pptx', 'PIL', 'lxml') if m in sys.modules))")
+   out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                        capture_output=True, text=True, check=True)
+   assert out.stdout.strip() == ""
+
+   cumulative = None
+   for line in out.stderr.splitlines():
+      m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| slidedeck$", line)
+      if (m):
+         cumulative = int(m.group(1))
+   assert cumulative is not None
+   assert cumulative < IMPORT_BUDGET_US
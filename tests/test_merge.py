@@ -0,0 +1,108 @@
+import zipfile
+
+from pptx import Presentation
+
+from slidedeck import Deck, Slide, main
+
+
+#  Save a deck with one "+"-bullet slide per title
+def build(template, fn, titles):
+   d = Deck(template)
+   for t in titles:
+      s = Slide(t.lower())
+      s.add_title(t)
+      s.add_main_bullets("+ " + t)
+      d.add_slide(s)
+   d.save(fn)
+   return fn
+
+
+def titles(fn):
+   return [s.shapes.title.text for s in Presentation(fn).slides]
+
+
+def test_merge_cli(template, tmp_path):
+   a = build(template, str(tmp_path / "a.pptx"), ["A1", "A2"])
+   b = build(template, str(tmp_path / "b.pptx"), ["B1"])
+   out = str(tmp_path / "out.pptx")
+   assert main(["merge", out, a, b]) == 0
+   assert titles(out) == ["A1", "A2", "B1"]
+
+
+def test_merge_cli_template_slides_not_copied(template, tmp_path):
+   t = build(template, str(tmp_path / "t.pptx"), ["T1"])
+   a = build(template, str(tmp_path / "a.pptx"), ["A1", "A2"])
+   out = str(tmp_path / "out.pptx")
+   assert main(["merge", out, a, "--template", t]) == 0
+   assert titles(out) == ["A1", "A2"]
+
+
+def test_merge_drops_links_to_other_slides(template, tmp_path):
+   fn = build(template, str(tmp_path / "a.pptx"), ["A1", "A2"])
+   pres = Presentation(fn)
+   (s1, s2) = list(pres.slides)
+   s1.shapes.title.click_action.target_slide = s2
+   s2.shapes.title.click_action.hyperlink.address = "https://www.stata.com"
+   pres.save(fn)
+
+   d = Deck(template)
+   d.merge(fn)
+   out = str(tmp_path / "out.pptx")
+   d.save(out)
+
+   (m1, m2) = list(Presentation(out).slides)
+   assert m1.shapes.title.click_action.target_slide is None
+   assert m2.shapes.title.click_action.hyperlink.address == "https://www.stata.com"
+   with zipfile.ZipFile(out) as z:
+      for name in z.namelist():
+         if (name.startswith("ppt/slides/slide")):
+            assert b'r:id=""' not in z.read(name)
+
+
+def test_merge_dedupes_video(template, exhibit, tmp_path):
+   movie = str(tmp_path / "clip.mp4")
+   with open(movie, "wb") as f:
+      f.write(b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 40)
+   fn = str(tmp_path / "a.pptx")
+   pres = Presentation(template)
+   for i in range(0, 2):
+      slide = pres.slides.add_slide(pres.slide_layouts[2])
+      slide.shapes.add_movie(movie, 0, 0, 914400, 914400, poster_frame_image=exhibit("poster"), mime_type="video/mp4")
+   pres.save(fn)
+
+   d = Deck(template)
+   d.merge(fn)
+   d.merge(fn)
+   out = str(tmp_path / "out.pptx")
+   d.save(out)
+
+   with zipfile.ZipFile(out) as z:
+      names = z.namelist()
+   assert len([n for n in names if n.endswith(".mp4")]) == 1
+   assert len([n for n in names if n.endswith(".png")]) == 1
+   slides = list(Presentation(out).slides)
+   assert len(slides) == 4
+   for s in slides:
+      rels = [r for r in s.part.rels.values() if (r.reltype.endswith("/video") or r.reltype.endswith("/media"))]
+      assert len(rels) == 2
+      assert rels[0].target_part is rels[1].target_part
+
+
+def test_merge_keeps_actions_without_targets(template, tmp_path):
+   from pptx.enum.action import PP_ACTION
+   from pptx.oxml.ns import qn
+
+   fn = build(template, str(tmp_path / "a.pptx"), ["A1", "A2"])
+   pres = Presentation(fn)
+   for (s, jump) in zip(pres.slides, ("nextslide", "endshow")):
+      cNvPr = s.shapes.title._element.nvSpPr.cNvPr
+      link = cNvPr.makeelement(qn("a:hlinkClick"), {qn("r:id"): "", "action": "ppaction://hlinkshowjump?jump=" + jump})
+      cNvPr.append(link)
+   pres.save(fn)
+
+   d = Deck(template)
+   d.merge(fn)
+   out = str(tmp_path / "out.pptx")
+   d.save(out)
+   actions = [s.shapes.title.click_action.action for s in Presentation(out).slides]
+   assert actions == [PP_ACTION.NEXT_SLIDE, PP_ACTION.END_SHOW]
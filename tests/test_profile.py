@@ -0,0 +1,95 @@
+import json
+import shutil
+
+from slidedeck import Deck, Slide, main
+
+
+def by_slide(report):
+   return {e["slide"]: e for e in report["slides"]}
+
+
+def test_text_counts(template):
+   d = Deck(template)
+   s = Slide("text")
+   s.add_title("Title")
+   s.add_main_bullets("+ plain ** bold ** plain")
+   s.add_main_bullets("++ one * two")
+   d.add_slide(s)
+   e = by_slide(d.profile())["text"]
+   assert (e["paragraphs"], e["runs"]) == (2, 5)
+   assert e["media"] == []
+
+
+def test_table_has_no_text_counts(chart_template):
+   d = Deck(chart_template)
+   s = Slide("table")
+   s.add_title("Title")
+   s.add_table({"year": [2021, 2022], "rgdp": [19.5, 20.1]})
+   d.add_slide(s)
+   e = by_slide(d.profile())["table"]
+   assert (e["paragraphs"], e["runs"]) == (0, 0)
+
+
+def test_shared_media(template, exhibit, tmp_path):
+   a = exhibit("a", "red")
+   b = exhibit("b", "blue")
+   copy = str(tmp_path / "copy.png")
+   shutil.copy(a, copy)
+
+   d = Deck(template)
+   for (name, pics) in (("first", [a, b]), ("second", [copy])):
+      s = Slide(name)
+      s.add_title(name)
+      for p in pics:
+         s.add_exhibit(p)
+      s.add_margin_bullets("- " + name)
+      d.add_slide(s)
+   report = d.profile()
+   slides = by_slide(report)
+
+   first = slides["first"]
+   assert len(first["media"]) == 2
+   assert first["shared_media_bytes"] == 0
+   assert first["media_bytes"] == sum(m["bytes"] for m in first["media"])
+
+   second = slides["second"]
+   assert second["media_bytes"] == 0
+   assert second["media"][0]["shared_with"] == "first"
+   assert second["shared_media_bytes"] == [m["bytes"] for m in first["media"] if m["sha1"] == second["media"][0]["sha1"]][0]
+   assert report["package_bytes"] > first["media_bytes"]
+
+
+def test_show_profile(template, capsys):
+   d = Deck(template)
+   s = Slide("text")
+   s.add_title("Title")
+   s.add_main_bullets("+ text")
+   d.add_slide(s)
+   report = d.profile()
+   capsys.readouterr()
+   assert d.show_profile(report) == report["package_bytes"]
+   out = capsys.readouterr().out
+   assert "Package: {:,} bytes".format(report["package_bytes"]) in out
+   assert "\ntext " in out
+
+
+SCRIPT = """from slidedeck import Deck, Slide
+d = Deck({template!r})
+s = Slide("s1")
+s.add_title("T")
+s.add_main_bullets("+ one ** two **")
+d.add_slide(s)
+d.save({out!r})
+"""
+
+
+def test_profile_cli(template, tmp_path, capsys):
+   script = tmp_path / "build.py"
+   script.write_text(SCRIPT.format(template=template, out=str(tmp_path / "out.pptx")))
+   assert main(["profile", str(script), "--json"]) == 0
+   (report,) = json.loads(capsys.readouterr().out)
+   assert report["deck"] == template
+   assert [(e["slide"], e["paragraphs"], e["runs"]) for e in report["slides"]] == [("s1", 1, 2)]
+
+   assert main(["profile", str(script)]) == 0
+   assert "s1" in capsys.readouterr().out
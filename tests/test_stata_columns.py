@@ -0,0 +1,75 @@
+import sys
+import types
+
+import pytest
+
+from slidedeck import stata_columns
+
+
+#  Stand-in for Stata's sfi module: Data.get() returns a list of rows, one
+#  list per observation, with missing values replaced by missingval
+class Data:
+   vars = {"year": [2019, 2020, 2021, 2022],
+           "rgdp": [19.0, 18.5, 8.0e307, 20.1],
+           "cpi": [1.8, 1.2, 4.7, 8.0],
+           "keep": [1, 0, 1, 1],
+           "none": [0, 0, 0, 0]}
+   labels = {"rgdp": "Real GDP", "cpi": "Real GDP"}
+   MISSING = 8.0e307
+
+   @classmethod
+   def get(cls, var=None, obs=None, selectvar=None, valuelabel=False, missingval=MISSING):
+      rows = []
+      for i in range(0, len(cls.vars["year"])):
+         if ((selectvar is not None) and (cls.vars[selectvar][i] == 0)):
+            continue
+         row = []
+         for v in var:
+            x = cls.vars[v][i]
+            row.append(missingval if (x >= cls.MISSING) else x)
+         rows.append(row)
+      return rows
+
+   @classmethod
+   def getVarLabel(cls, v):
+      return cls.labels.get(v, "")
+
+
+@pytest.fixture(autouse=True)
+def sfi(monkeypatch):
+   module = types.ModuleType("sfi")
+   module.Data = Data
+   monkeypatch.setitem(sys.modules, "sfi", module)
+   return module
+
+
+def test_columns():
+   assert stata_columns("year cpi") == {"year": [2019, 2020, 2021, 2022], "cpi": [1.8, 1.2, 4.7, 8.0]}
+
+
+def test_labels():
+   assert list(stata_columns(["year", "rgdp"], labels=True).keys()) == ["year", "Real GDP"]
+
+
+def test_duplicate_label_falls_back_to_name():
+   columns = stata_columns("rgdp cpi", labels=True)
+   assert columns == {"Real GDP": [19.0, 18.5, None, 20.1], "cpi": [1.8, 1.2, 4.7, 8.0]}
+
+
+def test_missing_is_none():
+   assert stata_columns("rgdp")["rgdp"][2] is None
+
+
+def test_single_variable():
+   assert stata_columns("year", selectvar="keep") == {"year": [2019, 2021, 2022]}
+
+
+def test_single_variable_flat_rows(monkeypatch):
+   monkeypatch.setattr(Data, "get", classmethod(lambda cls, var=None, selectvar=None, missingval=None: [1, 2]))
+   assert stata_columns("year") == {"year": [1, 2]}
+
+
+def test_empty_selection():
+   assert stata_columns("year") == {"year": [2019, 2020, 2021, 2022]}
+   assert stata_columns("year", selectvar="none") == {"year": []}
+   assert stata_columns("year cpi", selectvar="none") == {"year": [], "cpi": []}
@@ -0,0 +1,139 @@
+import re
+
+from pptx import Presentation
+from pptx.oxml.ns import qn
+from pptx.util import Pt
+
+from slidedeck import Deck, Slide
+
+#  Bullets from slidedeck.do
+MARGIN = ["- Real GDP continues to expand, but growth is slowing",
+          "- Industrial production has recovered strongly from the pandemic-induced recession",
+          "- Unemployment remains near its record low given strong labor market conditions",
+          "- Consumer price inflation has reached a ** four-decade ** high"]
+MAIN = ["+ *16 U.S. economic expansion continues, but the pace of growth has slowed",
+        "++ Consensus forecast suggests below-trend growth in second half of 2022",
+        "+ *16 Labor market conditions remain very strong amid high labor demand and low participation rates",
+        "+ *16 Unusually high inflation will prompt tighter monetary policy from the Federal Reserve"]
+
+
+#  Save a one-slide deck, reopen it and return the text frame of the
+#  placeholder filled from its main or margin runs
+def render(template, tmp_path, main=(), margin=()):
+   d = Deck(template)
+   s = Slide("s")
+   s.add_title("T")
+   for b in main:
+      s.add_main_bullets(b)
+   for b in margin:
+      s.add_margin_bullets(b)
+   d.add_slide(s)
+   lo = d.find_layout(s)[0]
+   idx = d.get_main_ph(lo)[-1] if (len(main) > 0) else d.get_margin_ph(lo)[-1]
+   fn = str(tmp_path / "out.pptx")
+   d.save(fn)
+   return (s, lo, idx, Presentation(fn).slides[0].placeholders[idx].text_frame)
+
+
+#  The rendering before defaults were moved into the list style: every run
+#  carries its own font name and size, and bold/italic when set
+def baseline_fill(tf, runs):
+   tf.clear()
+   for r in runs:
+      if (re.search("ParaLevel", r)):
+         (junk, level) = r.split("Level")
+         p = tf.add_paragraph()
+         p.level = int(level)
+      elif (re.search("::", r)):
+         (fnm, fsz, bbold, bitalic) = r.split("::")
+         run = p.add_run()
+         run.font.name = fnm
+         run.font.size = Pt(int(fsz))
+         if (bbold == "True"):
+            run.font.bold = True
+         if (bitalic == "True"):
+            run.font.italic = True
+      else:
+         run.text = r
+
+
+#  The level and effective (font, size, bold, italic) of each character of
+#  each paragraph, taking unset run properties from the frame's list style
+def characters(tf):
+   dflts = {}
+   lstStyle = tf._txBody.find(qn("a:lstStyle"))
+   if (lstStyle is not None):
+      for lvlPr in lstStyle:
+         defRPr = lvlPr.find(qn("a:defRPr"))
+         if (defRPr is not None):
+            level = int(re.search("lvl([0-9])pPr", lvlPr.tag).group(1)) - 1
+            dflts[level] = (defRPr.find(qn("a:latin")).get("typeface"), int(defRPr.get("sz")) // 100,
+                            defRPr.get("b") == "1", defRPr.get("i") == "1")
+   paras = []
+   for p in tf.paragraphs:
+      if (p.text == ""):
+         continue
+      dflt = dflts.get(p.level, (None, None, False, False))
+      chars = []
+      for run in p.runs:
+         f = run.font
+         fmt = (f.name if (f.name is not None) else dflt[0],
+                int(f.size.pt) if (f.size is not None) else dflt[1],
+                f.bold if (f.bold is not None) else dflt[2],
+                f.italic if (f.italic is not None) else dflt[3])
+         chars.extend([(c, fmt) for c in run.text])
+      paras.append((p.level, chars))
+   return paras
+
+
+def test_matches_baseline(template, tmp_path):
+   for (main, margin) in ((MAIN, ()), ((), MARGIN)):
+      (s, lo, idx, tf) = render(template, tmp_path, main, margin)
+      pres = Presentation(template)
+      slide = pres.slides.add_slide(pres.slide_layouts[lo])
+      baseline = slide.placeholders[idx].text_frame
+      baseline_fill(baseline, s.run_main if (len(main) > 0) else s.run_marg)
+      assert characters(tf) == characters(baseline)
+      assert [p.level for p in tf.paragraphs if (p.text != "")] == ([1, 2, 1, 1] if (len(main) > 0) else [1, 1, 1, 1])
+
+
+def test_list_style_defaults(template, tmp_path):
+   (s, lo, idx, tf) = render(template, tmp_path, main=MAIN)
+   lstStyle = tf._txBody.find(qn("a:lstStyle"))
+   assert [el.tag for el in lstStyle] == [qn("a:lvl2pPr"), qn("a:lvl3pPr")]
+   sizes = []
+   for lvlPr in lstStyle:
+      assert lvlPr.get("algn") == "l"
+      defRPr = lvlPr.find(qn("a:defRPr"))
+      assert defRPr.find(qn("a:latin")).get("typeface") == "Arial"
+      assert defRPr.get("b") is None
+      sizes.append(defRPr.get("sz"))
+   assert sizes == ["1600", "1100"]
+
+   #  Runs at the default formatting carry no font properties of their own
+   for p in tf.paragraphs:
+      for run in p.runs:
+         rPr = run._r.find(qn("a:rPr"))
+         if (rPr is not None):
+            assert rPr.get("sz") != {1: "1600", 2: "1100"}[p.level]
+
+
+def test_explicit_off(template, tmp_path):
+   (s, lo, idx, tf) = render(template, tmp_path, main=["+ ** mostly bold text here ** x", "++ * mostly italic text * y"])
+   lstStyle = tf._txBody.find(qn("a:lstStyle"))
+   assert lstStyle.find(qn("a:lvl2pPr")).find(qn("a:defRPr")).get("b") == "1"
+   assert lstStyle.find(qn("a:lvl3pPr")).find(qn("a:defRPr")).get("i") == "1"
+
+   paras = [p for p in tf.paragraphs if (p.text != "")]
+   (bold, plain) = paras[0].runs
+   assert (bold.text, bold.font.bold) == ("mostly bold text here", None)
+   assert (plain.text, plain._r.find(qn("a:rPr")).get("b")) == (" x", "0")
+   (italic, plain) = paras[1].runs
+   assert (italic.text, italic.font.italic) == ("mostly italic text", None)
+   assert (plain.text, plain._r.find(qn("a:rPr")).get("i")) == (" y", "0")
+
+
+def test_adjacent_runs_merged(template, tmp_path):
+   (s, lo, idx, tf) = render(template, tmp_path, main=["+ a ** ** b ** bold ** c"])
+   paras = [p for p in tf.paragraphs if (p.text != "")]
+   assert [(run.text, run.font.bold) for run in paras[0].runs] == [("a b", None), (" bold", True), (" c", None)]
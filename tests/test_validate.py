@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from slidedeck import Deck, Slide, main
+
+
+def checks(problems):
+   return [(p["slide"], p["check"]) for p in problems]
+
+
+@pytest.fixture
+def deck(template):
+   return Deck(template, dry_run=True)
+
+
+def test_clean_deck(deck, exhibit):
+   s = Slide("ok")
+   s.add_title("T")
+   s.add_exhibit(exhibit("a"))
+   s.add_margin_bullets("- short")
+   deck.add_slide(s)
+   assert deck.validate() == []
+   assert deck.show_problems() == 0
+
+
+def test_layout(deck, exhibit):
+   s = Slide("pics", defer_checks=True)
+   for i in range(0, 5):
+      s.add_exhibit(exhibit("p{}".format(i)))
+   deck.add_slide(s)
+   assert checks(deck.validate()) == [("pics", "layout")]
+
+
+def test_layout_raises_without_dry_run(template, exhibit):
+   s = Slide("pics")
+   for i in range(0, 5):
+      s.add_exhibit(exhibit("p{}".format(i)))
+   with pytest.raises(ValueError):
+      Deck(template).add_slide(s)
+
+
+def test_exhibits(deck, exhibit, tmp_path):
+   from PIL import Image
+
+   gif = str(tmp_path / "c.gif")
+   Image.new("RGB", (20, 20), "red").save(gif)
+   junk = str(tmp_path / "junk.png")
+   with open(junk, "w") as f:
+      f.write("not an image")
+   big = exhibit("big")
+   deck.MAX_EXHIBIT_BYTES = 50
+
+   s = Slide("pics", defer_checks=True)
+   for e in (str(tmp_path / "missing.png"), junk, gif, big):
+      s.add_exhibit(e)
+   deck.add_slide(s)
+   msgs = [p["message"] for p in deck.validate()]
+   assert len(msgs) == 4
+   assert "does not exist" in msgs[0]
+   assert "not a readable image" in msgs[1]
+   assert "not GIF" in msgs[2]
+   assert "over the" in msgs[3]
+
+
+def test_deferred_markdown(deck):
+   s = Slide("md", defer_checks=True)
+   s.add_title("T")
+   s.add_main_bullets("no marker")
+   deck.add_slide(s)
+   assert checks(deck.validate()) == [("md", "markdown")]
+
+
+def test_check_runs(deck):
+   assert deck.check_runs(["--- ParaLevel1", "Arial::11::False::False", "text"]) == []
+   assert deck.check_runs(["--- ParaLevel9"]) == ["bullet level 9 is outside the range 1-8"]
+   assert deck.check_runs(["Arial::11::False::False"]) == ["formatting directive before the first bullet"]
+   assert deck.check_runs(["--- ParaLevel1", "Arial::11"]) == ["malformed formatting directive 'Arial::11'"]
+   assert deck.check_runs(["--- ParaLevel1", "Arial::big::False::False"]) == ["font size 'big' is not a number"]
+   assert deck.check_runs(["--- ParaLevel1", "text"]) == ["text 'text' appears before any bullet"]
+
+
+def test_run_problems_are_reported(deck):
+   s = Slide("runs")
+   s.add_title("T")
+   s.add_main_bullets("+ text")
+   s.run_main.insert(0, "Arial::11::False::False")
+   deck.add_slide(s)
+   problems = deck.validate()
+   assert checks(problems) == [("runs", "markdown")]
+   assert problems[0]["message"] == "main text: formatting directive before the first bullet"
+
+
+def test_overflow(deck):
+   s = Slide("long")
+   s.add_title("T")
+   for i in range(0, 40):
+      s.add_main_bullets("+ " + "a long line of bullet text " * 4)
+   deck.add_slide(s)
+   problems = deck.validate()
+   assert checks(problems) == [("long", "overflow")]
+   assert problems[0]["message"].startswith("main text: needs about")
+
+
+def test_markers_without_text(deck, tmp_path):
+   s = Slide("empty")
+   s.add_title("T")
+   s.add_main_bullets("+ **")
+   deck.add_slide(s)
+   assert deck.validate() == []
+
+   #  The same slide renders without error
+   deck.dry_run = False
+   deck.save(str(tmp_path / "out.pptx"))
+
+
+SCRIPT = """from slidedeck import Deck, Slide
+d = Deck({template!r})
+s = Slide("s1")
+s.add_title("T")
+s.add_main_bullets({bullet!r})
+d.add_slide(s)
+d.save({out!r})
+"""
+
+
+def test_check_cli(template, tmp_path, capsys):
+   script = tmp_path / "build.py"
+   out = str(tmp_path / "out.pptx")
+
+   script.write_text(SCRIPT.format(template=template, bullet="+ fine", out=out))
+   assert main(["check", str(script)]) == 0
+   assert "0 problem(s) found" in capsys.readouterr().out
+
+   script.write_text(SCRIPT.format(template=template, bullet="no marker", out=out))
+   assert main(["check", str(script), "--json"]) == 1
+   report = json.loads(capsys.readouterr().out)
+   assert [(p["deck"], p["slide"], p["check"]) for p in report] == [(out, "s1", "markdown")]
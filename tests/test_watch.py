@@ -0,0 +1,111 @@
+import zipfile
+
+from pptx import Presentation
+
+from slidedeck import Deck, Slide, load_decks, rebuild_changed, write_atomic
+
+
+def check_output(fn, expected):
+   with zipfile.ZipFile(fn) as z:
+      names = z.namelist()
+   assert len(names) == len(set(names))
+   assert [s.shapes.title.text for s in Presentation(fn).slides] == expected
+
+
+def test_rerender(template, exhibit, tmp_path):
+   d = Deck(template)
+   for name in ("a", "b", "c"):
+      s = Slide(name)
+      s.add_title("T" + name)
+      s.add_exhibit(exhibit(name))
+      s.add_margin_bullets("- slide " + name)
+      d.add_slide(s)
+   d.render_all()
+
+   #  Re-render twice, so replacement slides replace earlier replacements
+   for rnd in ("1", "2"):
+      for s in d.slides[0:2]:
+         s.chg_title("T" + s.name + rnd)
+      assert d.rerender(["a", "b"]) == 2
+   out = str(tmp_path / "out.pptx")
+   d.write(out)
+   check_output(out, ["Ta2", "Tb2", "Tc"])
+
+
+SCRIPT = """from slidedeck import Deck, Slide
+d = Deck({template!r})
+for (name, title) in {titles!r}:
+   s = Slide(name)
+   s.add_title(title)
+   s.add_main_bullets("+ slide " + name)
+   d.add_slide(s)
+d.save({out!r})
+"""
+
+
+def test_rebuild_changed(template, tmp_path):
+   script = tmp_path / "build.py"
+   out = str(tmp_path / "out.pptx")
+
+   def edit(titles):
+      script.write_text(SCRIPT.format(template=template, titles=titles, out=out))
+
+   edit([("a", "Ta"), ("b", "Tb"), ("c", "Tc")])
+   decks = load_decks(str(script), defer_checks=False)
+   for d in decks:
+      d.render_all()
+      write_atomic(d)
+
+   edit([("a", "Ta1"), ("b", "Tb1"), ("c", "Tc")])
+   decks = rebuild_changed(str(script), decks)
+   edit([("a", "Ta1"), ("b", "Tb2"), ("c", "Tc2")])
+   decks = rebuild_changed(str(script), decks)
+   check_output(out, ["Ta1", "Tb2", "Tc2"])
+
+
+WATCHED = """from slidedeck import Deck, Slide
+d = Deck({template!r})
+for (name, title) in (("a", "Ta"), ("b", {title!r})):
+   s = Slide(name)
+   s.add_title(title)
+   s.add_exhibit({exhibits!r}[name])
+   s.add_margin_bullets("- slide " + name)
+   d.add_slide(s)
+d.save({out!r})
+"""
+
+
+def test_watch_script_and_exhibit_change(template, exhibit, tmp_path, monkeypatch):
+   import hashlib
+
+   import slidedeck
+
+   script = tmp_path / "build.py"
+   out = str(tmp_path / "out.pptx")
+   exhibits = {"a": exhibit("a", "red"), "b": exhibit("b", "blue")}
+
+   def edit(title):
+      script.write_text(WATCHED.format(template=template, title=title, exhibits=exhibits, out=out))
+   edit("Tb")
+
+   #  Change the script and an exhibit it uses between the same two polls,
+   #  then stop watching after a poll with no changes
+   polls = []
+
+   def poll(interval):
+      polls.append(interval)
+      if (len(polls) == 1):
+         edit("Tb1")
+         exhibit("a", "green")
+      elif (len(polls) == 3):
+         raise KeyboardInterrupt
+
+   monkeypatch.setattr(slidedeck.time, "sleep", poll)
+   assert slidedeck.watch(str(script), interval=0) == 0
+
+   check_output(out, ["Ta", "Tb1"])
+   with open(exhibits["a"], "rb") as f:
+      sha1 = hashlib.sha1(f.read()).hexdigest()
+   slide = Presentation(out).slides[0]
+   images = [rel.target_part.sha1 for rel in slide.part.rels.values() if (rel.reltype.endswith("/image"))]
+   assert images == [sha1]